@@ -1,5 +1,6 @@
 import random
 
+import numpy as np
 import pygame
 
 from dark.labyrinth import Labyrinth
@@ -14,20 +15,15 @@ FPS_LIMIT = 60
 SCREEN_SIZE = (WIDTH * CELL_SIZE + 1, HEIGHT * CELL_SIZE + 1)
 
 
-def generate_labyrinth() -> list[tuple[pygame.Vector2, pygame.Vector2]]:
+def generate_labyrinth() -> np.ndarray:
     """Generate new random labyrinth.
 
     Returns:
-        list[tuple[pygame.Vector2, pygame.Vector2]]: labyrinth walls
+        np.ndarray: (m, 2, 2) float32 array of labyrinth wall start and end points
     """
     labyrinth = Labyrinth(WIDTH, HEIGHT)
     edges = labyrinth.generate()
-    walls = []
-    for edge in edges:
-        start_wall = pygame.Vector2(edge.start) * CELL_SIZE
-        end_wall = pygame.Vector2(edge.end) * CELL_SIZE
-        walls.append((start_wall, end_wall))
-    return walls
+    return edges.astype(np.float32).reshape(-1, 2, 2) * CELL_SIZE
 
 
 class Game:
@@ -61,7 +57,9 @@ class Game:
         self.goal = pygame.Vector2(random.randint(0, WIDTH - 1) + 0.5, random.randint(0, HEIGHT - 1) + 0.5) * CELL_SIZE
         self.position = pygame.Vector2(random.randint(0, WIDTH - 1) + 0.5, random.randint(0, HEIGHT - 1) + 0.5) * CELL_SIZE
         self.walls = generate_labyrinth()
-        self.rays = RayTracing(self.walls, RAYS)
+        self.rays = RayTracing(self.walls, RAYS, cell_size=CELL_SIZE)
+        self.ray_points = np.empty((2 * self.rays.n, 2), dtype=np.float32)
+        self.last_position = None
         self.trace = []
         self.reached_goal = False
 
@@ -109,9 +107,16 @@ class Game:
                 self.trace.append(self.position)
 
             # Calculate ray-wall intersections and draw rays
-            intersections = self.rays.get_ray_intersections(self.position)
-            for intersection in intersections:
-                pygame.draw.line(self.screen, self.ray_color, self.position, intersection, 1)
+            # Rays are only recalculated when the player moved, otherwise the ray points
+            # of the last frame are still valid. Rays without a hit (NaN) are not kept.
+            if self.last_position is None or (self.position - self.last_position).length_squared() >= 1e-6:
+                intersections = self.rays.get_ray_intersections(self.position)
+                self.ray_points[0::2] = self.position
+                self.ray_points[1::2] = intersections
+                self.last_position = None if np.isnan(intersections).any() else self.position
+            # Draw all rays with a single call as one polyline alternating between
+            # the position and the intersections
+            pygame.draw.lines(self.screen, self.ray_color, False, self.ray_points.tolist(), 1)
 
             # Draw goal and player
             pygame.draw.circle(self.screen, self.goal_color, self.goal, self.circle_radius)
@@ -124,7 +129,7 @@ class Game:
             # Display walls and trace when player reached the goal
             # Enable new game button
             if self.reached_goal:
-                for wall in self.walls:
+                for wall in self.walls.tolist():
                     pygame.draw.line(self.screen, self.wall_color, wall[0], wall[1], 2)
                 for i in range(1, len(self.trace)):
                     pygame.draw.line(self.screen, self.trace_color, self.trace[i - 1], self.trace[i], 2)
@@ -1,52 +1,69 @@
 from __future__ import annotations
 
-import random
+import numba
+import numpy as np
 
 
-class Cell:
-    def __init__(self, position: tuple[int, int]):
-        """Initialize new cell.
-        
-        Create all surrounding edges.
-        Create an empty set of all connected cells and add self.
-        """
-        self.position = position
-        self.edges = set([
-            Edge(position, (position[0] + 1, position[1])),
-            Edge(position, (position[0], position[1] + 1)),
-            Edge((position[0], position[1] + 1), (position[0] + 1, position[1] + 1)),
-            Edge((position[0] + 1, position[1]), (position[0] + 1, position[1] + 1))
-        ])
-        self.set: set[Cell] = set()
-        self.set.add(self)
-
-    def __hash__(self):
-        return hash(self.position)
-    
-    def __eq__(self, other: Cell):
-        return self.position == other.position
+@numba.njit(cache=True)
+def find(parent: np.ndarray, i: int) -> int:
+    """Find the representative of the set containing cell i.
 
-    def __repr__(self):
-        return f"Cell({self.position})"
+    Compresses the path so all visited cells point directly to the representative.
+    """
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
 
 
-class Edge:
-    def __init__(self, start: tuple[int, int], end: tuple[int, int]):
-        self.start = start
-        self.end = end
-        self.set = set()
-        self.set.add(self)
-        self.cells: list[Cell] = list()
+@numba.njit(cache=True)
+def union(parent: np.ndarray, rank: np.ndarray, i: int, j: int):
+    """Merge the sets with representatives i and j by rank."""
+    if rank[i] < rank[j]:
+        i, j = j, i
+    parent[j] = i
+    if rank[i] == rank[j]:
+        rank[i] += 1
 
-    def __hash__(self):
-        return hash((self.start, self.end))
 
-    def __eq__(self, other: Edge):
-        return (self.start, self.end) == (other.start, other.end)
+@numba.njit(cache=True)
+def generate_njit(edge_ids: np.ndarray, edge_cells: np.ndarray, parent: np.ndarray, rank: np.ndarray,
+                  out_keep: np.ndarray) -> int:
+    """Shuffle edge_ids and remove edges until all cells are connected (Kruskal).
+
+    Writes the ids of the remaining edges to out_keep and returns their count.
+    """
+    kept = 0
+
+    # Schuffle edges
+    np.random.shuffle(edge_ids)
+
+    # iterate over all edges and remove them form the original set until its empty.
+    for edge in edge_ids:
+        cell1, cell2 = edge_cells[edge, 0], edge_cells[edge, 1]
+
+        # When edge is a border edge, add it to final set
+        if cell1 < 0 or cell2 < 0:
+            out_keep[kept] = edge
+            kept += 1
+            continue
+
+        root1 = find(parent, cell1)
+        root2 = find(parent, cell2)
+
+        # When adjacent cells of the edge are not connected remove edge (dont add to final set)
+        # and merge the sets of both cells.
+        if root1 != root2:
+            union(parent, rank, root1, root2)
+        # When cells are connected, add edge to final set
+        else:
+            out_keep[kept] = edge
+            kept += 1
+
+    return kept
 
-    def __repr__(self):
-        return f"Edge({self.start}, {self.end})"
-    
 
 class Grid:
     def __init__(self, width: int, height: int):
@@ -56,60 +73,52 @@ class Grid:
 
     def reset(self):
         """Initialize Grid.
-        
-        Create width x height cells and create all edges.
-        For each edge store the adjacent cells in a dictionary.
+
+        Enumerate all edges of the width x height cells, first the horizontal edges
+        row by row, then the vertical edges. For each edge store its end points and
+        the ids (y * width + x) of the adjacent cells, -1 outside of the grid.
+        Initialize a union-find structure where every cell is its own set.
         """
-        self.edges: dict[Edge, list[Cell]] = dict()
-        for x in range(self.width):  
-            for y in range(self.height):
-                cell = Cell((x, y))
-                for edge in cell.edges:
-                    self.edges.setdefault(edge, list()).append(cell)
+        # Horizontal edges (x, y) -> (x + 1, y) between cells (x, y - 1) and (x, y)
+        hx, hy = (a.ravel() for a in np.meshgrid(np.arange(self.width), np.arange(self.height + 1)))
+        # Vertical edges (x, y) -> (x, y + 1) between cells (x - 1, y) and (x, y)
+        vx, vy = (a.ravel() for a in np.meshgrid(np.arange(self.width + 1), np.arange(self.height)))
+
+        self.edge_points = np.concatenate([
+            np.stack([hx, hy, hx + 1, hy], axis=1),
+            np.stack([vx, vy, vx, vy + 1], axis=1),
+        ]).astype(np.int16)                                                                             # (E, 4)
+        self.edge_cells = np.concatenate([
+            np.stack([np.where(hy > 0, (hy - 1) * self.width + hx, -1),
+                      np.where(hy < self.height, hy * self.width + hx, -1)], axis=1),
+            np.stack([np.where(vx > 0, vy * self.width + vx - 1, -1),
+                      np.where(vx < self.width, vy * self.width + vx, -1)], axis=1),
+        ]).astype(np.int32)                                                                             # (E, 2)
+
+        self.parent = np.arange(self.width * self.height, dtype=np.int32)
+        self.rank = np.zeros(self.width * self.height, dtype=np.int32)
 
     def __repr__(self):
         return f"Grid({self.width}, {self.height})"
-    
+
 
 class Labyrinth:
     def __init__(self, width: int, height: int):
         self.grid = Grid(width, height)
 
-    def generate(self) -> list[Edge]:
+    def generate(self) -> np.ndarray:
         """Generate Labyrinth by removing random edges of a grid until all cells are connected.
+
+        Returns:
+            np.ndarray: (n, 4) int16 array of the remaining edges as (x1, y1, x2, y2)
         """
         # Initialize Grid
         self.grid.reset()
-        edges = list(self.grid.edges.keys())
-        new_edges: list[Edge] = []
-
-        # Schuffle edges
-        random.shuffle(edges)
-
-        # iterate over all edges and remove them form the original set until its empty.
-        while edges:
-            edge = edges.pop()
-            
-            # When edge is a border edge, add it to final set
-            if len(self.grid.edges[edge]) < 2:
-                new_edges.append(edge)
-                continue
-
-            cell1 = self.grid.edges[edge][0]
-            cell2 = self.grid.edges[edge][1]
-
-            # When adjacent cells of the edge are not connected remove edge (dont add to final set)
-            # and update the sets of all newly connected cells.
-            if cell1.set != cell2.set:
-                for cell in cell1.set.copy():
-                    cell.set.update(cell2.set)  
-                for cell in cell2.set.copy():
-                    cell.set.update(cell1.set)
-            # When cells are connected, add edge to final set
-            else:
-                new_edges.append(edge)
-            
-        return new_edges
+        edge_ids = np.arange(len(self.grid.edge_cells), dtype=np.int32)
+        out_keep = np.empty_like(edge_ids)
+
+        kept = generate_njit(edge_ids, self.grid.edge_cells, self.grid.parent, self.grid.rank, out_keep)
+        return self.grid.edge_points[out_keep[:kept]]
 
     def __repr__(self):
         return f"Labyrinth({self.grid})"
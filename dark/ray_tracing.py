@@ -1,77 +1,312 @@
+import functools
+
+import numba
+import numpy as np
 import pygame
-import torch
 
 
-class RayTracing:
-    """Implementation based on https://en.wikipedia.org/wiki/Line%E2%80%93line_intersection"""
-    def __init__(self, walls: list[tuple[pygame.Vector2, pygame.Vector2]], rays: int, tol=1e-10, device="cpu"):
-        self.tol = tol
-        self.device = torch.device(device)
+# All fast-math flags except nnan/ninf: missing intersections are encoded as inf/NaN.
+FASTMATH = {"nsz", "arcp", "contract", "afn", "reassoc"}
 
-        # Prepare wall vectors
-        self.wall_start = torch.tensor([wall[0] for wall in walls], dtype=torch.float32, device=self.device)
-        self.wall_end   = torch.tensor([wall[1] for wall in walls], dtype=torch.float32, device=self.device)
-        self.wall_vec   = self.wall_end - self.wall_start 
+# Walls are padded to a multiple of the SIMD width (8 float32 lanes with AVX2). LLVM
+# prefers 256-bit vectors on AVX-512 hosts like Sapphire Rapids as well.
+SIMD_WIDTH = 8
 
-        # Prepare ray vectors
-        angles_deg = torch.arange(0, 360, step=360 / rays, dtype=torch.float32, device=self.device)     # 0 to 360
-        angles_rad = torch.deg2rad(angles_deg)                                                          # 0 to 2pi
-        # Each row is a 2D unit vector [cos(θ), sin(θ)]
-        self.rays = torch.stack([torch.cos(angles_rad), torch.sin(angles_rad)], axis=1)                 # (n, 2)
+# Kernels run in float32: scalars and constants must be float32 as well, since mixing
+# them with float64 (Python floats, np.inf) promotes the arithmetic to double precision
+# and halves the number of SIMD lanes.
+INF = np.float32(np.inf)
 
-        # Calculate matrix dimensions
-        self.n, self.m = self.rays.shape[0], self.wall_vec.shape[0]
+# Walls are extended by this fraction of their length at both ends, so rounding can not
+# let a ray through the shared end point of two walls slip between them.
+WALL_TOL = np.float32(1e-4)
 
-        # Prepare Matix
-        self.d1_b = torch.broadcast_to(self.rays.reshape(-1, 1, 2),       (self.n, self.m, 2))          # (n, m, 2)
-        self.d2_b = torch.broadcast_to(self.wall_vec.reshape(1, -1, 2),   (self.n, self.m, 2))          # (n, m, 2)
-        self.q1_b = torch.broadcast_to(self.wall_start.reshape(1, -1, 2), (self.n, self.m, 2))          # (n, m, 2)
+# Ray parameter of the target for wall collisions, the direction spans the whole way.
+TMAX_COLLISION = np.float32(1)
+
+
+@numba.njit(fastmath=FASTMATH, error_model="numpy", inline="always", cache=True)
+def intersect(px, py, dx, dy, sx, sy, wx, wy, wl2, tol, tmax):
+    """
+    Returns the ray parameter t of the intersection of the ray starting at (px, py)
+    with direction (dx, dy) and the wall starting at (sx, sy) with direction (wx, wy)
+    and squared length wl2. Returns +inf if they do not intersect with t ≤ tmax.
+    """
+    det = dx * wy - dy * wx
+    bx = sx - px
+    by = sy - py
+    t = (bx * wy - by * wx) / det
+
+    # Instead of a second division for the wall parameter u, project the hit point
+    # onto the wall: 0 ≤ u ≤ 1 is equivalent to 0 ≤ (hit - start)·w ≤ |w|²
+    s = (t * dx - bx) * wx + (t * dy - by) * wy
+
+    # Apply parametric constraints: 0 ≤ t ≤ tmax (fan ray), 0 ≤ u ≤ 1 (segment)
+    s_tol = WALL_TOL * wl2
+    valid = (abs(det) >= tol) & (t >= 0) & (t <= tmax) & (s >= -s_tol) & (s <= wl2 + s_tol)
+    return t if valid else INF
+
+
+@numba.njit(fastmath=FASTMATH, error_model="numpy", inline="always", cache=True)
+def cast_ray(px, py, dx, dy, wsx, wsy, wdx, wdy, wl2, tol, tmax, t_row):
+    """
+    Returns the ray parameter t of the closest intersection of the ray starting at
+    (px, py) with direction (dx, dy) and m walls with t ≤ tmax, +inf if there is none.
+
+    Walls are given by their start points (wsx, wsy), direction vectors (wdx, wdy) and
+    squared lengths wl2. t_row is a (m, ) scratch buffer.
+
+    The wall loop is branchless so LLVM vectorizes it for the host CPU (AVX2/FMA where
+    available): t is computed for every pair and rejected pairs are stored as +inf.
+    Numba does not vectorize float min reductions, but non-negative floats order like
+    their int32 bit patterns, so the closest hit is found with an integer min instead.
+    """
+    t_bits = t_row.view(np.int32)
+    for j in range(wsx.shape[0]):
+        t_row[j] = intersect(px, py, dx, dy, wsx[j], wsy[j], wdx[j], wdy[j], wl2[j], tol, tmax)
+
+    # Reinterpret the minimal bit pattern as float again
+    t_bits[0] = t_bits.min()
+    return t_row[0]
+
+
+@numba.njit(fastmath=FASTMATH, error_model="numpy", inline="always", cache=True)
+def cast_grid_ray(px, py, dx, dy, wsx, wsy, wdx, wdy, wl2, tol, tmax,
+                  ox, oy, cell_size, nx, ny, cell_start, cell_walls):
+    """
+    Same as cast_ray, but walls are binned into a uniform grid of nx times ny cells
+    with origin (ox, oy). The walls of cell c are cell_walls[cell_start[c]:cell_start[c + 1]].
+
+    The ray walks through the grid cell by cell (Amanatides & Woo) starting in the
+    cell containing (px, py) and only tests the walls of the visited cells. The walk
+    stops at the first cell containing a hit before the ray leaves it, or at the cell
+    containing the end of the ray at tmax. When the ray leaves the grid without a hit,
+    all walls are tested as a fallback.
+    """
+    # Start cell, rays are expected to start inside the grid
+    ix = min(max(int(np.floor((px - ox) / cell_size)), 0), nx - 1)
+    iy = min(max(int(np.floor((py - oy) / cell_size)), 0), ny - 1)
+
+    # Step direction, ray parameter to the next cell border and between two borders
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    t_max_x = (ox + np.float32(ix + (dx > 0)) * cell_size - px) / dx if dx != 0 else INF
+    t_max_y = (oy + np.float32(iy + (dy > 0)) * cell_size - py) / dy if dy != 0 else INF
+    t_delta_x = cell_size / abs(dx) if dx != 0 else INF
+    t_delta_y = cell_size / abs(dy) if dy != 0 else INF
+
+    best_t = INF
+    while True:
+        c = iy * nx + ix
+        for k in range(cell_start[c], cell_start[c + 1]):
+            j = cell_walls[k]
+            t = intersect(px, py, dx, dy, wsx[j], wsy[j], wdx[j], wdy[j], wl2[j], tol, tmax)
+            best_t = min(best_t, t)
+
+        # Stop when the closest hit lies within the current cell or the ray ends in it
+        t_exit = min(t_max_x, t_max_y)
+        if best_t <= t_exit or t_exit > tmax:
+            break
+
+        # Step to the next cell
+        if t_max_x < t_max_y:
+            ix += step_x
+            t_max_x += t_delta_x
+        else:
+            iy += step_y
+            t_max_y += t_delta_y
+        if ix < 0 or ix >= nx or iy < 0 or iy >= ny:
+            if best_t == INF:
+                for j in range(wsx.shape[0]):
+                    t = intersect(px, py, dx, dy, wsx[j], wsy[j], wdx[j], wdy[j], wl2[j], tol, tmax)
+                    best_t = min(best_t, t)
+            break
+
+    return best_t
+
+
+@numba.njit(fastmath=FASTMATH, error_model="numpy", inline="always", cache=True)
+def store_hit(out, i, px, py, dx, dy, t):
+    """Writes the hit point at ray parameter t to out[i], NaN if there is no hit."""
+    if t < INF:
+        out[i, 0] = px + t * dx
+        out[i, 1] = py + t * dy
+    else:
+        out[i, 0] = np.nan
+        out[i, 1] = np.nan
 
-    def calculate_intersections(self, n, m, p1, d1, q1_b, d1_b, d2_b, unlimit=False):
-        """
-        Calculates the closest intersections of n times m lines where all n lines
-        share the same starting point.
-        
-        """
-        b = q1_b - p1                                                                                   # (n, m, 2)
 
-        A = torch.stack([d1_b, d2_b], axis=-1)                                                          # (n, m, 2, 2)
-        det = A[..., 0, 0] * A[..., 1, 1] - A[..., 0, 1] * A[..., 1, 0]                                 # (n, m)
-        parallel_mask = torch.abs(det) < self.tol                                                       # (n, m)
-        valid = ~parallel_mask                                                                          # (n, m)
+@numba.njit(parallel=True, fastmath=FASTMATH, error_model="numpy", cache=True)
+def calculate_intersections(pos, rdx, rdy, wsx, wsy, wdx, wdy, wl2, tol, tmax, t_buf, out):
+    """
+    Calculates the closest intersections of n rays with m walls where all rays
+    share the same starting point pos, see cast_ray.
 
-        intersections = torch.full((n, m, 2), torch.nan, dtype=torch.float32, device=self.device)       # (n, m, 2)
-        t_all = torch.full((n, m), torch.nan, dtype=torch.float32, device=self.device)                  # (n, m)
-        if torch.any(valid):
-            A_valid = A[valid]
-            b_valid = b[valid]
-            det_valid = det[valid]
+    Results are written to the (n, 2) array out, rays without an intersection are set
+    to NaN. t_buf is a (n, m) scratch buffer. Rays are distributed over all CPU cores,
+    each ray only writes its own output row and scratch row.
+    """
+    px, py = pos[0], pos[1]
+    for i in numba.prange(rdx.shape[0]):
+        t = cast_ray(px, py, rdx[i], rdy[i], wsx, wsy, wdx, wdy, wl2, tol, tmax, t_buf[i])
+        store_hit(out, i, px, py, rdx[i], rdy[i], t)
 
-            t = (b_valid[:, 0] * A_valid[:, 1, 1] - b_valid[:, 1] * A_valid[:, 0, 1]) / det_valid
-            u = (b_valid[:, 0] * A_valid[:, 1, 0] - b_valid[:, 1] * A_valid[:, 0, 0]) / det_valid
 
-            # Apply parametric constraints: t ≥ 0 (fan ray), 0 ≤ u ≤ 1 (segment)
-            mask_tu = (t >= 0) & (unlimit | (t <= 1)) & (u >= 0) & (u <= 1)
+@numba.njit(parallel=True, fastmath=FASTMATH, error_model="numpy", cache=True)
+def calculate_grid_intersections(pos, rdx, rdy, wsx, wsy, wdx, wdy, wl2, tol, tmax,
+                                 ox, oy, cell_size, nx, ny, cell_start, cell_walls, out):
+    """
+    Same as calculate_intersections, but walls are binned into a uniform grid,
+    see cast_grid_ray.
+    """
+    px, py = pos[0], pos[1]
+    for i in numba.prange(rdx.shape[0]):
+        t = cast_grid_ray(px, py, rdx[i], rdy[i], wsx, wsy, wdx, wdy, wl2, tol, tmax,
+                          ox, oy, cell_size, nx, ny, cell_start, cell_walls)
+        store_hit(out, i, px, py, rdx[i], rdy[i], t)
 
-            # Map back into full (n, m) shape
-            full_indices = torch.nonzero(valid.flatten(), as_tuple=False).flatten()
-            accepted_indices = full_indices[mask_tu]
 
-            d1_valid = d1_b.reshape(-1, 2)[accepted_indices]
-            intersections.reshape(-1, 2)[accepted_indices] = p1 + t[mask_tu, None] * d1_valid
-            t_all.reshape(-1)[accepted_indices] = t[mask_tu]
+@numba.njit(fastmath=FASTMATH, error_model="numpy", cache=True)
+def calculate_collision(pos, direction, wsx, wsy, wdx, wdy, wl2, tol, tmax, t_row):
+    """
+    Returns the ray parameter t of the closest intersection of a single ray starting at
+    pos with direction direction, see cast_ray. The ray is cast serially, a parallel
+    region would only add thread overhead.
+    """
+    return cast_ray(pos[0], pos[1], direction[0], direction[1], wsx, wsy, wdx, wdy, wl2, tol, tmax, t_row)
 
-        # Compute distances (along the ray, so t * |d1|)
-        d1_norm = torch.linalg.matrix_norm(d1)                                                          # (n, )
-        distances = t_all * d1_norm                                                                     # (n, m)
-        distances[~torch.isfinite(distances)] = torch.inf
 
-        min_indices = torch.argmin(distances, axis=1)                                                   # (n,)
-        closest_points = intersections[torch.arange(n, device=self.device), min_indices]                # (n, 2)
+@numba.njit(fastmath=FASTMATH, error_model="numpy", cache=True)
+def calculate_grid_collision(pos, direction, wsx, wsy, wdx, wdy, wl2, tol, tmax,
+                             ox, oy, cell_size, nx, ny, cell_start, cell_walls):
+    """
+    Same as calculate_collision, but walls are binned into a uniform grid,
+    see cast_grid_ray.
+    """
+    return cast_grid_ray(pos[0], pos[1], direction[0], direction[1], wsx, wsy, wdx, wdy, wl2, tol, tmax,
+                         ox, oy, cell_size, nx, ny, cell_start, cell_walls)
 
-        return closest_points
 
-    def get_ray_intersections(self, position: pygame.Vector2) -> list[pygame.Vector2]:
+def bin_walls(wall_points: np.ndarray, cell_size: float) -> tuple[float, float, int, int, np.ndarray, np.ndarray]:
+    """
+    Bins walls into a uniform grid covering all walls. A wall is added to every cell
+    whose (closed) area touches the walls bounding box, so walls lying on a cell border
+    belong to both adjacent cells and walls ending on a cell border or corner belong to
+    all cells touching the end point. Rays passing exactly through a corner or along a
+    border then find the wall in whichever of these cells they visit.
+
+    Args:
+        wall_points (np.ndarray): (m, 2, 2) wall start and end points
+        cell_size (float): Size of a grid cell
+
+    Returns:
+        tuple[float, float, int, int, np.ndarray, np.ndarray]: grid origin, number of
+        cells in x and y and the walls of each cell as offsets into a flat wall index array
+    """
+    ox, oy = wall_points.min(axis=(0, 1))
+    nx, ny = np.maximum(np.ceil((wall_points.max(axis=(0, 1)) - (ox, oy)) / cell_size), 1).astype(int)
+
+    # Expand the bounding boxes by a small fraction of a cell, so rounding can not drop
+    # a cell only touched by the end point of a wall.
+    eps = 1e-3
+    lo = (np.minimum(wall_points[:, 0], wall_points[:, 1]) - (ox, oy)) / cell_size - eps              # (m, 2)
+    hi = (np.maximum(wall_points[:, 0], wall_points[:, 1]) - (ox, oy)) / cell_size + eps              # (m, 2)
+    lo = np.maximum(np.floor(lo).astype(int), 0)
+    hi = np.minimum(np.floor(hi).astype(int), (nx - 1, ny - 1))
+
+    cell_walls: list[list[int]] = [[] for _ in range(nx * ny)]
+    for j in range(wall_points.shape[0]):
+        for y in range(lo[j, 1], hi[j, 1] + 1):
+            for x in range(lo[j, 0], hi[j, 0] + 1):
+                cell_walls[y * nx + x].append(j)
+
+    cell_start = np.zeros(nx * ny + 1, dtype=np.int32)
+    cell_start[1:] = np.cumsum([len(walls) for walls in cell_walls])
+    flat_walls = np.array([j for walls in cell_walls for j in walls], dtype=np.int32)
+    return float(ox), float(oy), int(nx), int(ny), cell_start, flat_walls
+
+
+@functools.cache
+def ray_directions(rays: int) -> np.ndarray:
+    """
+    Returns the directions of rays evenly spread around the full circle, computed
+    once per number of rays. The array is shared by all callers and read-only.
+
+    Args:
+        rays (int): Number of rays
+
+    Returns:
+        np.ndarray: (2, n) x and y components of the ray unit vectors [cos(θ), sin(θ)]
+    """
+    # linspace yields exactly n angles, a float step could add one at 2pi
+    angles = np.linspace(0, 2 * np.pi, rays, endpoint=False)                                            # 0 to 2pi
+    directions = np.stack([np.cos(angles), np.sin(angles)]).astype(np.float32)                          # (2, n)
+    directions.setflags(write=False)
+    return directions
+
+
+class RayTracing:
+    """Implementation based on https://en.wikipedia.org/wiki/Line%E2%80%93line_intersection"""
+    def __init__(self, walls: np.ndarray, rays: int, tol=1e-10,
+                 cell_size: float | None = None):
+        """
+        Args:
+            walls (np.ndarray): (m, 2, 2) wall start and end points
+            rays (int): Number of rays
+            tol (float, optional): Tolerance for parallel rays and walls. Defaults to 1e-10.
+            cell_size (float | None, optional): When given, walls are binned into a uniform
+                grid with this cell size and rays only test walls of the cells they pass.
+                Otherwise every ray is tested against every wall. Defaults to None.
+        """
+        self.tol = np.float32(tol)
+
+        # Prepare wall vectors: store them as one contiguous structure of arrays, one row
+        # per component. Rows are padded with zero length walls to a multiple of SIMD_WIDTH:
+        # they never intersect, but spare the vectorized wall loop its scalar remainder.
+        wall_points = np.asarray(walls, dtype=np.float32).reshape(-1, 2, 2)                             # (m, 2, 2)
+        m_padded = -(-wall_points.shape[0] // SIMD_WIDTH) * SIMD_WIDTH
+        self.wall_soa = np.zeros((5, m_padded), dtype=np.float32)                                       # (5, m)
+        self.wall_soa[:4, :wall_points.shape[0]] = np.concatenate(
+            [wall_points[:, 0].T, (wall_points[:, 1] - wall_points[:, 0]).T])                           # start, direction
+        self.wsx, self.wsy, self.wdx, self.wdy, self.wl2 = self.wall_soa                                # (m, )
+        self.wl2[:] = self.wdx * self.wdx + self.wdy * self.wdy                                         # squared length
+
+        # Prepare ray vectors, shared by all instances with the same number of rays
+        self.rdx, self.rdy = ray_directions(rays)                                                       # (n, )
+
+        # Calculate matrix dimensions
+        self.n, self.m = self.rdx.shape[0], wall_points.shape[0]
+
+        # Position, direction and output buffers reused by every call
+        self._pos = np.empty(2, dtype=np.float32)                                                       # (2, )
+        self._dir = np.empty(2, dtype=np.float32)                                                       # (2, )
+        self._ray_out = np.empty((self.n, 2), dtype=np.float32)                                         # (n, 2)
+
+        # Bin walls into a uniform grid
+        self.cell_size = cell_size
+        if cell_size is not None:
+            ox, oy, self.nx, self.ny, self.cell_start, self.cell_walls = bin_walls(wall_points, cell_size)
+            self.ox, self.oy, self.cell_size = np.float32(ox), np.float32(oy), np.float32(cell_size)
+
+        # Select the kernels and bind their arguments once, so calls neither branch on the
+        # wall layout nor gather the arguments. There is a single build of each kernel,
+        # compiled by Numba for the host CPU. Only the brute force kernels need the
+        # scratch buffer.
+        walls = (self.wsx, self.wsy, self.wdx, self.wdy, self.wl2, self.tol)
+        if self.cell_size is None:
+            self._t_buf = np.empty((self.n, m_padded), dtype=np.float32)                               # (n, m)
+            self._cast_rays = functools.partial(calculate_intersections, self._pos, self.rdx, self.rdy,
+                                                *walls, INF, self._t_buf, self._ray_out)
+            self._cast_ray = functools.partial(calculate_collision, self._pos, self._dir,
+                                               *walls, TMAX_COLLISION, self._t_buf[0])
+        else:
+            grid = (self.ox, self.oy, self.cell_size, self.nx, self.ny, self.cell_start, self.cell_walls)
+            self._cast_rays = functools.partial(calculate_grid_intersections, self._pos, self.rdx, self.rdy,
+                                                *walls, INF, *grid, self._ray_out)
+            self._cast_ray = functools.partial(calculate_grid_collision, self._pos, self._dir,
+                                               *walls, TMAX_COLLISION, *grid)
+
+    def get_ray_intersections(self, position: pygame.Vector2) -> np.ndarray:
         """
         For each of n rays (from common point position with direction ray),
         find the closest intersection with walls.
@@ -80,16 +315,18 @@ class RayTracing:
             position (pygame.Vector2): Current Position
 
         Returns:
-            list[pygame.Vector2]: List of ray intersections with walls
+            np.ndarray: (n, 2) float32 array of ray intersections with walls.
+                The array is reused and overwritten by the next call.
         """
-        p1 = torch.tensor(position, dtype=torch.float32, device=self.device).reshape(1, 1, 2)               # (1, 1, 2)
-
-        closest_points = self.calculate_intersections(self.n, self.m, p1, self.rays, self.q1_b, self.d1_b, self.d2_b, True)
-        return [pygame.Vector2(point[0], point[1]) for point in closest_points]
+        # Write the position into a preallocated buffer instead of creating new objects
+        self._pos[0] = position.x
+        self._pos[1] = position.y
+        self._cast_rays()
+        return self._ray_out
 
     def get_wall_collision(self, position: pygame.Vector2, direction: pygame.Vector2) -> pygame.Vector2 | None:
         """
-        Calculates the next intersection with a wall on the way from the current direction 
+        Calculates the next intersection with a wall on the way from the current direction
         to the target location.
 
         Args:
@@ -99,11 +336,11 @@ class RayTracing:
         Returns:
             pygame.Vector2 | None: Intersection with wall if any.
         """
-        p1 = torch.tensor(position, dtype=torch.float32, device=self.device).reshape(1, 1, 2)               # (1, 1, 2)
-        d1 = torch.tensor(direction, dtype=torch.float32, device=self.device).reshape(1, 1, 2)              # (1, 1, 2)
-        d1_b = torch.broadcast_to(d1, (1, self.m, 2))                                                       # (1, m, 2)
-        q1_b = self.wall_start.reshape(1, -1, 2)                                                            # (1, m, 2)
-        d2_b = self.wall_vec.reshape(1, -1, 2)                                                              # (1, m, 2)
-
-        closest_point = self.calculate_intersections(1, self.m, p1, d1, q1_b, d1_b, d2_b).reshape((2,))     # (2, )
-        return None if torch.isnan(closest_point).any() else pygame.Vector2(closest_point[0], closest_point[1])
+        # Write the position and direction into preallocated buffers instead of creating new
+        # objects. The ray ends at the target (t = 1), so the grid walk stops there as well.
+        self._pos[0] = position.x
+        self._pos[1] = position.y
+        self._dir[0] = direction.x
+        self._dir[1] = direction.y
+        t = self._cast_ray()
+        return None if t == INF else position + direction * float(t)